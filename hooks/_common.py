@@ -0,0 +1,58 @@
+"""
+Frozen Gates: helpers shared by the hooks
+"""
+
+import json
+import os
+import re
+import fnmatch
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+_yaml = None  # PyYAML, imported lazily by import_yaml()
+GLOB_CHARS = re.compile(r"[*?[]")
+STAR_RUNS = re.compile(r"\*{2,}")
+
+
+def import_yaml():
+    """Import PyYAML on first use; most hook runs never need it."""
+    global _yaml
+    if _yaml is None:
+        import yaml
+        _yaml = yaml
+    return _yaml
+
+
+def specialize_pattern(pattern):
+    """Return a plain string check equivalent to fnmatch for common shapes.
+
+    Handles literals, "*.ext", "dir/**" and "**/*" relative to the matched
+    name; anything else, including absolute patterns, returns None and is
+    left to a regex.
+    """
+    if not pattern or os.path.isabs(pattern):
+        return None
+    if pattern == "**/*":
+        # fnmatch's "*" also matches "/", so this only needs one slash somewhere
+        return lambda name: "/" in name
+    if not GLOB_CHARS.search(pattern):
+        return lambda name: name == pattern
+    if pattern.startswith("*.") and not GLOB_CHARS.search(pattern[1:]):
+        suffix = pattern[1:]
+        return lambda name: name.endswith(suffix)
+    if pattern.endswith("/**") and not GLOB_CHARS.search(pattern[:-3]):
+        prefix = pattern[:-2]
+        return lambda name: name.startswith(prefix)
+    return None
+
+
+def translate_glob(pattern):
+    """fnmatch.translate, with runs of "*" collapsed first.
+
+    "**" means the same as "*" to fnmatch, so the collapsed form matches the
+    same names with a shorter regex.
+    """
+    return fnmatch.translate(STAR_RUNS.sub("*", pattern))
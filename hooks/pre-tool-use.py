@@ -7,14 +7,9 @@ Blocks Write/Edit operations on frozen files defined in frozengates.yaml
 import sys
 import json
 import os
-from pathlib import Path
-from fnmatch import fnmatch
+import re
 
-try:
-    import yaml
-    HAS_YAML = True
-except ImportError:
-    HAS_YAML = False
+from _common import json_loads, import_yaml, specialize_pattern, translate_glob
 
 
 def load_config():
@@ -42,62 +37,115 @@ def load_config():
     if not os.path.exists(config_path):
         return None
 
-    if not HAS_YAML:
-        # Fallback: try to parse simple YAML manually
-        return None
-
     try:
+        yaml = import_yaml()
         with open(config_path) as f:
             return yaml.safe_load(f)
     except Exception:
         return None
 
 
+def compile_frozen_patterns(repo_path, patterns):
+    """Prepare a repo's frozen patterns for matching.
+
+    Returns (checks, globs, regex). checks pairs each pattern that has a plain
+    string equivalent with its predicate over the repo-relative path. The
+    remaining globs are unioned into one regex over the absolute path, with a
+    named group per pattern (p0, p1, ...) so ``match.lastgroup`` tells which
+    one matched; regex is None when there are none.
+    """
+    checks = []
+    globs = []
+    for pattern in patterns:
+        check = specialize_pattern(pattern)
+        if check:
+            checks.append((pattern, check))
+        else:
+            globs.append(pattern)
+
+    if not globs:
+        return checks, globs, None
+
+    alternatives = []
+    for i, pattern in enumerate(globs):
+        target = os.path.join(repo_path, pattern)
+        alternatives.append(f"(?P<p{i}>{re.escape(target)}\\Z|{translate_glob(target)})")
+    return checks, globs, re.compile("|".join(alternatives))
+
+
+def pattern_anchor(pattern):
+    """Deepest directory every path matching an absolute pattern lies under."""
+    literal = re.split(r"[*?\[]", pattern, maxsplit=1)[0]
+    return os.path.dirname(literal)
+
+
 def get_frozen_paths(config):
-    """Extract all frozen file paths from config."""
-    frozen = []
+    """Extract frozen entries from config, grouped by absolute repo path.
+
+    Patterns are kept raw here; is_path_frozen compiles them only for the
+    repos that contain the checked file. An absolute pattern may point outside
+    its repo, so it is filed under its own anchor directory instead.
+    """
+    by_path = {}
 
     if not config or "repos" not in config:
-        return frozen
+        return by_path
 
     for repo_name, repo_config in config["repos"].items():
         repo_path = os.path.expanduser(repo_config.get("path", ""))
         if not repo_path:
             continue
+        abs_path = os.path.abspath(repo_path)
 
         if repo_config.get("frozen_all"):
-            frozen.append({"path": repo_path, "pattern": "**/*", "repo": repo_name, "full": True})
-        elif "frozen" in repo_config:
+            by_path.setdefault(abs_path, []).append({"repo": repo_name, "full": True})
+        elif repo_config.get("frozen"):
+            grouped = {}
             for pattern in repo_config["frozen"]:
-                frozen.append({"path": repo_path, "pattern": pattern, "repo": repo_name, "full": False})
+                anchor = pattern_anchor(pattern) if os.path.isabs(pattern) else abs_path
+                grouped.setdefault(anchor, []).append(pattern)
+            for anchor, patterns in grouped.items():
+                by_path.setdefault(anchor, []).append({
+                    "repo": repo_name,
+                    "full": False,
+                    "patterns": patterns
+                })
 
-    return frozen
+    return by_path
 
 
 def is_path_frozen(file_path, frozen_paths):
     """Check if a file path matches any frozen pattern."""
     file_path = os.path.abspath(os.path.expanduser(file_path))
 
-    for frozen in frozen_paths:
-        repo_path = os.path.abspath(frozen["path"])
-
-        if frozen["full"]:
-            # Entire directory is frozen
-            if file_path.startswith(repo_path + "/") or file_path == repo_path:
+    # Only repos containing the file can freeze it: walk its ancestors,
+    # innermost first, with one dict lookup per level
+    repo_path = file_path
+    while True:
+        rel_path = file_path[len(repo_path):].lstrip("/")
+        for frozen in frozen_paths.get(repo_path, ()):
+            if frozen["full"]:
+                # Entire directory is frozen
                 return frozen["repo"], "entire directory"
-        else:
-            # Specific file pattern
-            target = os.path.join(repo_path, frozen["pattern"])
-            if file_path == target or fnmatch(file_path, target):
-                return frozen["repo"], frozen["pattern"]
+            # Specific file patterns: string checks first, then one regex
+            checks, globs, regex = compile_frozen_patterns(repo_path, frozen["patterns"])
+            for pattern, check in checks:
+                if check(rel_path):
+                    return frozen["repo"], pattern
+            match = regex and regex.match(file_path)
+            if match:
+                return frozen["repo"], globs[int(match.lastgroup[1:])]
 
-    return None, None
+        parent = os.path.dirname(repo_path)
+        if parent == repo_path:
+            return None, None
+        repo_path = parent
 
 
 def main():
     # Read hook input from stdin
     try:
-        hook_input = json.load(sys.stdin)
+        hook_input = json_loads(sys.stdin.buffer.read())
     except Exception:
         sys.exit(0)
 
@@ -7,21 +7,27 @@ Checks LOC limits on modified files before session ends.
 import sys
 import json
 import os
+import re
+import mmap
+import functools
 import subprocess
-from pathlib import Path
 
-try:
-    import yaml
-except ImportError:
-    print("frozen-gates: PyYAML required - install via your package manager", file=sys.stderr)
-    sys.exit(1)
+from _common import json_loads, import_yaml, specialize_pattern, translate_glob
 
 DEFAULT_LOC_LIMIT = 500
 DEFAULT_LOC_EXTENSIONS = [".ts", ".tsx", ".js", ".jsx", ".py", ".rs", ".go", ".vue"]
 
+# A line counts if it holds anything besides whitespace. Lines start after
+# "\n" or a lone "\r", matching Python's universal newlines
+NONBLANK_LINE = re.compile(rb"(?:^|\r)[ \t\f\v]*[^\s]", re.MULTILINE)
+MMAP_THRESHOLD = 1024 * 1024
+LOC_WORKERS = 8
+TRANSCRIPT_MTIME_SLACK = 2  # seconds, covers coarse filesystem timestamps
 
+
+@functools.lru_cache(maxsize=256)
 def find_git_root(path):
-    """Find git root for a path."""
+    """Find git root for a path (memoized; files often share a directory)."""
     try:
         result = subprocess.run(
             ["git", "-C", path, "rev-parse", "--show-toplevel"],
@@ -34,33 +40,66 @@ def find_git_root(path):
     return None
 
 
-def get_loc_config(config, repo_path):
-    """Get LOC config for a specific repo, with defaults."""
-    defaults = config.get("defaults", {}).get("loc", {})
-    default_limit = defaults.get("limit", DEFAULT_LOC_LIMIT)
-    default_extensions = defaults.get("extensions", DEFAULT_LOC_EXTENSIONS)
-
-    # Check if file is in a configured repo with custom LOC settings
+def build_repo_index(config):
+    """Map each configured repo's absolute path to (repo_name, repo_config)."""
+    by_path = {}
     if config and "repos" in config:
         for repo_name, repo_config in config["repos"].items():
             rpath = os.path.expanduser(repo_config.get("path", ""))
             if not rpath:
                 continue
+            by_path.setdefault(os.path.abspath(rpath), (repo_name, repo_config))
+    return by_path
+
+
+def find_repo(repo_index, file_path):
+    """Find the innermost configured repo containing file_path.
+
+    Walks the path's ancestors, one dict lookup each, so the cost depends on
+    path depth rather than on how many repos are configured.
+    """
+    path = file_path
+    while True:
+        repo = repo_index.get(path)
+        if repo:
+            return repo
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+
+def get_loc_extensions(config):
+    """All extensions any repo (or the defaults) checks, for a quick reject."""
+    defaults = config.get("defaults", {}).get("loc", {})
+    extensions = set(defaults.get("extensions", DEFAULT_LOC_EXTENSIONS))
+    for repo_config in (config.get("repos") or {}).values():
+        extensions.update((repo_config.get("loc") or {}).get("extensions", ()))
+    return frozenset(extensions)
+
+
+def get_loc_config(config, file_path, repo_index):
+    """Get LOC config for the repo containing file_path, with defaults."""
+    defaults = config.get("defaults", {}).get("loc", {})
+    default_limit = defaults.get("limit", DEFAULT_LOC_LIMIT)
+    default_extensions = defaults.get("extensions", DEFAULT_LOC_EXTENSIONS)
 
-            rpath = os.path.abspath(rpath)
-            if repo_path.startswith(rpath + "/") or repo_path == rpath:
-                repo_loc = repo_config.get("loc", {})
-                return {
-                    "limit": repo_loc.get("limit", default_limit),
-                    "extensions": repo_loc.get("extensions", default_extensions),
-                    "exclude": repo_loc.get("exclude", []),
-                    "repo_name": repo_name
-                }
+    # Check if file is in a configured repo with custom LOC settings
+    repo = find_repo(repo_index, file_path)
+    if repo:
+        repo_name, repo_config = repo
+        repo_loc = repo_config.get("loc", {})
+        return {
+            "limit": repo_loc.get("limit", default_limit),
+            "extensions": repo_loc.get("extensions", default_extensions),
+            "exclude": repo_loc.get("_exclude"),
+            "repo_name": repo_name
+        }
 
     return {
         "limit": default_limit,
         "extensions": default_extensions,
-        "exclude": [],
+        "exclude": None,
         "repo_name": None
     }
 
@@ -72,13 +111,13 @@ def extract_modified_from_transcript(transcript_path):
         return modified
 
     try:
-        with open(transcript_path, "r", encoding="utf-8") as f:
+        with open(transcript_path, "rb") as f:
             for line in f:
-                line = line.strip()
-                if not line:
+                # Only lines carrying a tool call are worth parsing
+                if b'"tool_use"' not in line:
                     continue
                 try:
-                    entry = json.loads(line)
+                    entry = json_loads(line)
                     # Tool calls are nested in message.content[]
                     message = entry.get("message", {})
                     content = message.get("content", [])
@@ -98,11 +137,15 @@ def extract_modified_from_transcript(transcript_path):
 
 
 def get_session_modified_files(transcript_path):
-    """Extract modified files from session transcript AND all subagent transcripts."""
+    """Extract modified files from session transcript AND all subagent transcripts.
+
+    Returns a set of absolute paths, so a file edited many times (or by
+    several agents) is only checked once.
+    """
     modified = set()
 
     if not transcript_path or not os.path.exists(transcript_path):
-        return list(modified)
+        return modified
 
     # Extract session ID from main transcript filename
     session_id = os.path.basename(transcript_path).replace('.jsonl', '')
@@ -111,38 +154,86 @@ def get_session_modified_files(transcript_path):
     # Get files from main transcript
     modified.update(extract_modified_from_transcript(transcript_path))
 
+    # Agent transcripts of this session are only written after it started;
+    # where the platform records the main transcript's creation time, skip
+    # older agent transcripts on metadata alone
+    started = getattr(os.stat(transcript_path), "st_birthtime", None)
+    session_tag = session_id.encode()
+
     # Find and process all agent-*.jsonl transcripts that belong to this session
-    for agent_transcript in Path(transcript_dir).glob('agent-*.jsonl'):
-        try:
-            with open(agent_transcript, "r", encoding="utf-8") as f:
-                first_line = f.readline().strip()
-                if first_line:
-                    entry = json.loads(first_line)
-                    # Only process agent transcripts that belong to this session
-                    if entry.get('sessionId') == session_id:
-                        modified.update(extract_modified_from_transcript(str(agent_transcript)))
-        except Exception:
-            continue
+    with os.scandir(transcript_dir or ".") as entries:
+        for entry in entries:
+            if not (entry.name.startswith("agent-") and entry.name.endswith(".jsonl")):
+                continue
+            try:
+                if started is not None and entry.stat().st_mtime < started - TRANSCRIPT_MTIME_SLACK:
+                    continue
+                with open(entry.path, "rb") as f:
+                    first_line = f.readline()
+                if session_tag not in first_line:
+                    continue
+                # Only process agent transcripts that belong to this session
+                if json_loads(first_line).get("sessionId") == session_id:
+                    modified.update(extract_modified_from_transcript(entry.path))
+            except Exception:
+                continue
 
-    return list(modified)
+    return modified
 
 
-def count_loc(file_path):
-    """Count non-empty lines in a file."""
+def count_loc(file_path, size):
+    """Count non-empty lines in a file.
+
+    size is the file's st_size, already taken by the caller's os.stat().
+    """
     try:
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            return sum(1 for line in f if line.strip())
+        with open(file_path, "rb") as f:
+            # Map large files instead of copying them into memory
+            if size > MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    return len(NONBLANK_LINE.findall(data))
+            return len(NONBLANK_LINE.findall(f.read()))
     except Exception:
         return 0
 
 
-def matches_pattern(filename, patterns):
-    """Check if filename matches any glob pattern."""
-    from fnmatch import fnmatch
+def compile_patterns(patterns):
+    """Turn glob patterns into one predicate (None if there are none).
+
+    Patterns with a plain string equivalent are checked directly; the rest
+    are unioned into a single regex.
+    """
+    checks = []
+    globs = []
     for pattern in patterns:
-        if fnmatch(filename, pattern):
-            return True
-    return False
+        check = specialize_pattern(pattern)
+        if check:
+            checks.append(check)
+        else:
+            globs.append(pattern)
+
+    if globs:
+        checks.append(re.compile("|".join(f"(?:{translate_glob(p)})" for p in globs)).match)
+    if not checks:
+        return None
+    if len(checks) == 1:
+        return checks[0]
+    return lambda name: any(check(name) for check in checks)
+
+
+def matches_pattern(filename, matcher):
+    """Check if filename matches a predicate from compile_patterns()."""
+    return matcher is not None and bool(matcher(filename))
+
+
+def compile_config(config):
+    """Precompile every repo's LOC excludes into repo["loc"]["_exclude"]."""
+    if config and config.get("repos"):
+        for repo_config in config["repos"].values():
+            repo_loc = repo_config.get("loc")
+            if repo_loc:
+                repo_loc["_exclude"] = compile_patterns(repo_loc.get("exclude", []))
+    return config
 
 
 def load_config():
@@ -152,21 +243,32 @@ def load_config():
     1. $CLAUDE_PROJECT_DIR/.claude/frozengates.yaml (session scope)
     2. ~/.claude/frozengates.yaml (user scope)
     """
+    config_path = None
+
     # Check session's project dir
     project_dir = os.environ.get("CLAUDE_PROJECT_DIR")
     if project_dir:
         project_config = os.path.join(project_dir, ".claude", "frozengates.yaml")
         if os.path.exists(project_config):
-            with open(project_config) as f:
-                return yaml.safe_load(f)
+            config_path = project_config
 
     # Fall back to user scope
-    user_config = os.path.expanduser("~/.claude/frozengates.yaml")
-    if os.path.exists(user_config):
-        with open(user_config) as f:
-            return yaml.safe_load(f)
+    if not config_path:
+        user_config = os.path.expanduser("~/.claude/frozengates.yaml")
+        if os.path.exists(user_config):
+            config_path = user_config
 
-    return None
+    if not config_path:
+        return None
+
+    try:
+        yaml = import_yaml()
+    except ImportError:
+        print("frozen-gates: PyYAML required - install via your package manager", file=sys.stderr)
+        sys.exit(1)
+
+    with open(config_path) as f:
+        return compile_config(yaml.safe_load(f))
 
 
 def get_context_percent(hook_input):
@@ -192,7 +294,7 @@ def get_context_percent(hook_input):
 def main():
     # Read hook input from stdin
     try:
-        hook_input = json.load(sys.stdin)
+        hook_input = json_loads(sys.stdin.buffer.read())
     except Exception:
         hook_input = {}
 
@@ -221,29 +323,53 @@ def main():
     if not modified_files:
         sys.exit(0)
 
-    violations = []
+    repo_index = build_repo_index(config)
+    loc_extensions = get_loc_extensions(config)
+    to_count = []
 
     for file_path in modified_files:
-        if not os.path.exists(file_path):
+        # Cheapest reject first: no repo checks this extension at all.
+        # Same result as Path(file_path).suffix, without building a Path
+        stem, dot, ext = file_path.rpartition("/")[2].rpartition(".")
+        ext = dot + ext if stem and ext else ""
+        if ext not in loc_extensions:
             continue
 
-        # Get git root for this file (for relative path display)
-        file_dir = os.path.dirname(file_path)
-        git_root = find_git_root(file_dir)
+        # One stat both checks existence and sizes the file for count_loc
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            continue
 
-        ext = Path(file_path).suffix
-        loc_config = get_loc_config(config, file_path)
+        loc_config = get_loc_config(config, file_path, repo_index)
 
         # Check extension
         if ext not in loc_config["extensions"]:
             continue
 
+        # Get git root for this file (for relative path display)
+        file_dir = os.path.dirname(file_path)
+        git_root = find_git_root(file_dir)
+
         # Check exclusions
         rel_path = os.path.relpath(file_path, git_root) if git_root else file_path
-        if matches_pattern(rel_path, loc_config.get("exclude", [])):
+        if matches_pattern(rel_path, loc_config["exclude"]):
             continue
 
-        loc = count_loc(file_path)
+        to_count.append((file_path, st.st_size, rel_path, loc_config))
+
+    paths = [item[0] for item in to_count]
+    sizes = [item[1] for item in to_count]
+    if len(to_count) > 1:
+        # Counting is file I/O, which releases the GIL, so overlap the reads
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(LOC_WORKERS, len(to_count))) as pool:
+            locs = list(pool.map(count_loc, paths, sizes))
+    else:
+        locs = list(map(count_loc, paths, sizes))
+
+    violations = []
+    for (_, _, rel_path, loc_config), loc in zip(to_count, locs):
         limit = loc_config["limit"]
 
         if loc > limit: